@@ -1,24 +1,91 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
+import polars as pl
+import orjson
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import plotly.graph_objects as go
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # --- CONFIGURACIÓN ---
+# set_page_config tiene que ejecutarse en cada rerun, por eso sigue aquí
 st.set_page_config(page_title="Pro Trading Dashboard", layout="wide")
-try:
-    API_KEY = st.secrets["FMP_API_KEY"]
-except:
-    # Esto es por si lo corres en tu PC local sin configurar secretos
-    API_KEY = "TU_API_KEY_AQUI_SOLO_PARA_LOCAL"
 BASE_URL = "https://financialmodelingprep.com/api/v3"
+STABLE_URL = "https://financialmodelingprep.com/stable"
+MAX_WORKERS = 8
+SCREENER_LIMIT = 50
+SCREENER_MIN_CAP = 1000 # En millones
+# Formato visual (printf) de cada columna numérica, común a todas las tablas.
+# Lo aplica el navegador: al websocket viajan los números sin formatear
+NUMBER_FORMATS = {
+    'price': '$%.2f',
+    'beta': '%.2f',
+    'marketCap': '$%,.0f',
+    'volume': '%,.0f',
+    'epsEstimated': '%.2f',
+    'epsActual': '%.2f',
+    'revenueEstimated': '$%,.0f',
+    'revenueActual': '$%,.0f',
+    'adjDividend': '$%.3f',
+    'yield': '%.2f%%',
+    'Fuerza': '%.2f%%'
+}
+# Campos del perfil que muestra Info Símbolos; el resto no se guarda
+PROFILE_FIELDS = ("image", "price", "beta", "companyName", "sector", "industry", "ceo", "description", "website")
+HIST_COLS = ['date', 'open', 'high', 'low', 'close', 'volume', 'changePercent']
+SECTORS = ["Technology", "Healthcare", "Financial Services", "Energy", "Consumer Cyclical"]
 
 # --- FUNCIONES DE CARGA DE DATOS ---
-@st.cache_data(ttl=300)
-def get_json(endpoint, params=None):
-    if params is None:
-        params = {}
-    params['apikey'] = API_KEY
+@st.cache_resource
+def _api_key():
+    # Se resuelve una sola vez por proceso, no en cada rerun
+    try:
+        return st.secrets["FMP_API_KEY"]
+    except (KeyError, FileNotFoundError):
+        # Esto es por si lo corres en tu PC local sin configurar secretos
+        return os.environ.get("FMP_API_KEY", "TU_API_KEY_AQUI_SOLO_PARA_LOCAL")
+
+@st.cache_resource
+def _session():
+    # Sesión compartida: reutiliza conexiones keep-alive con FMP en vez de
+    # abrir un TCP+TLS nuevo por llamada, y reintenta errores transitorios.
+    # Además guarda las respuestas en SQLite (caché L2) para que sobrevivan
+    # a reinicios del proceso; st.cache_data sigue siendo la caché L1.
+    session = requests_cache.CachedSession(
+        ".fmp_cache.sqlite",
+        backend="sqlite",
+        urls_expire_after={
+            "*/profile/*": 86400,
+            "*/historical-price-full/*": 3600,
+            "*/quotes/forex": 60,
+            "*": 300,
+        },
+        # No guardamos la API key en disco ni la usamos como parte de la clave
+        ignored_parameters=["apikey"]
+    )
+    # Seguimos con requests (HTTP/1.1 keep-alive) porque la caché SQLite y los
+    # reintentos dependen de él; el pool deja una conexión viva por hilo de
+    # get_json_many (MAX_WORKERS) para no repetir el handshake TLS
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    return session
+
+def _request_json(endpoint, params=None):
+    # Llamada HTTP sin comandos de Streamlit: se puede usar desde hilos en segundo plano
+    # Copiamos para no modificar el dict del llamador (puede compartirse entre hilos)
+    params = dict(params or {})
+    params['apikey'] = _api_key()
     
     # Lógica para usar URLs completas (stable) o relativas (v3)
     if endpoint.startswith("http"):
@@ -26,64 +93,172 @@ def get_json(endpoint, params=None):
     else:
         url = f"{BASE_URL}/{endpoint}"
         
+    response = _session().get(url, params=params, timeout=(3, 10), stream=False)
+    response.raise_for_status()
+    # orjson parsea los bytes directamente, sin decodificar antes a str
+    return orjson.loads(response.content)
+
+@st.cache_data(ttl=300)
+def _fetch_json(endpoint, params=None):
+    # Caché L1 de _request_json; sigue sin comandos de Streamlit
+    return _request_json(endpoint, params)
+
+def describe_error(e):
+    # Texto para la UI: código HTTP + "Error Message" de FMP si viene en el
+    # cuerpo. Nunca mostramos la URL tal cual porque lleva la API key
+    response = getattr(e, 'response', None)
+    if response is not None:
+        message = f"HTTP {response.status_code}"
+        try:
+            body = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            body = None
+        if isinstance(body, dict) and 'Error Message' in body:
+            message += f": {body['Error Message']}"
+    else:
+        message = str(e)
+    return re.sub(r"apikey=[^&\s'\"]+", "apikey=***", message)
+
+def _stop_if_unauthorized(e):
+    # API key inválida (401) o endpoint fuera del plan (403): paramos aquí en
+    # vez de seguir repitiendo la misma llamada fallida en cada rerun
+    if e.response is None:
+        return
+    if e.response.status_code == 401:
+        st.error(f"FMP rechazó la API key ({describe_error(e)}). Revisa FMP_API_KEY.")
+        st.stop()
+    if e.response.status_code == 403:
+        st.error(f"FMP denegó el acceso ({describe_error(e)}). Revisa los permisos de tu plan.")
+        st.stop()
+
+def get_json(endpoint, params=None):
     try:
-        response = requests.get(url, params=params)
-        return response.json()
-    except Exception as e:
-        st.error(f"Error de conexión: {e}")
-        return []
+        return _fetch_json(endpoint, params)
+    except requests.HTTPError as e:
+        _stop_if_unauthorized(e)
+        raise
+
+def get_json_many(calls):
+    # Lanza varias llamadas (endpoint, params) a la vez: son solo espera de red,
+    # así que el tiempo total es el de la más lenta y no la suma de todas.
+    # Cada hilo hereda el contexto de Streamlit para poder usar la caché.
+    # Devuelve, en orden, los datos o la excepción de cada llamada: un fallo
+    # no descarta los resultados de las demás.
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=min(len(calls), MAX_WORKERS),
+                            initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        futures = [executor.submit(_fetch_json, *call) for call in calls]
+    
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            results.append(e)
+    
+    # Una API key inválida (401) hace fallar todas: se avisa una sola vez
+    # desde el hilo principal y se para el rerun. Un 403 suele ser un
+    # endpoint concreto fuera del plan, así que queda como error de esa llamada
+    for result in results:
+        if (isinstance(result, requests.HTTPError) and result.response is not None
+                and result.response.status_code == 401):
+            _stop_if_unauthorized(result)
+    return results
+
+def show_result(render, result):
+    # Pinta un resultado de get_json_many o el error de esa llamada
+    if isinstance(result, Exception):
+        st.error(f"Error FMP: {describe_error(result)}")
+    else:
+        render(result)
+
+def _prewarm():
+    # Precarga en la caché SQLite los datos que casi siempre se piden primero,
+    # para que el primer clic del usuario no espere a la red
+    for endpoint, params in [
+        ("quotes/forex", None),
+        ("profile/AAPL", None),
+        ("company-screener", screener_params(SCREENER_MIN_CAP * 1000000, SCREENER_LIMIT)),
+    ]:
+        try:
+            _request_json(endpoint, params)
+        except (requests.RequestException, orjson.JSONDecodeError):
+            pass # Es solo una optimización: si falla, se cargará al pedirlo
+
+def to_frame(data, cols):
+    # Convierte la respuesta JSON en un LazyFrame de Polars con solo las
+    # columnas pedidas que existan, sin copiar el resto
+    df = pl.from_dicts(data, infer_schema_length=None)
+    return df.lazy().select([c for c in cols if c in df.columns])
+
+def show_table(df):
+    # Tabla con los valores numéricos crudos y el formato como column_config
+    column_config = {
+        c: st.column_config.NumberColumn(format=fmt)
+        for c, fmt in NUMBER_FORMATS.items() if c in df.columns
+    }
+    st.dataframe(df, column_config=column_config, use_container_width=True, hide_index=True)
+
 # --- 1. STOCK SCREENER (CORREGIDO CON NUEVO ENDPOINT) ---
+def screener_params(min_market_cap, limit, sector=None):
+    # Usamos los parámetros exactos de la documentación que enviaste
+    params = {
+        'marketCapMoreThan': min_market_cap,
+        'limit': limit,
+        'isEtf': 'false',
+        'isActivelyTrading': 'true'
+    }
+    if sector:
+        params['sector'] = sector
+    return params
+
 def show_screener():
     st.header("🔍 Stock Screener")
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        limit = st.number_input("Cantidad de resultados", min_value=10, max_value=1000, value=50)
+        limit = st.number_input("Cantidad de resultados", min_value=10, max_value=1000, value=SCREENER_LIMIT)
     with col2:
         # El input es en Millones, lo multiplicamos para la API
-        min_cap_input = st.number_input("Min Market Cap (Millions)", value=1000)
+        min_cap_input = st.number_input("Min Market Cap (Millions)", value=SCREENER_MIN_CAP)
         min_market_cap = min_cap_input * 1000000
     with col3:
-        sector = st.selectbox("Sector", ["Technology", "Healthcare", "Financial Services", "Energy", "Consumer Cyclical", "All"], index=5)
+        # Sin selección = todos los sectores
+        sectors = st.multiselect("Sectores", SECTORS, placeholder="All")
 
     if st.button("Ejecutar Screener"):
-        # Usamos los parámetros exactos de la documentación que enviaste
-        params = {
-            'marketCapMoreThan': min_market_cap,
-            'limit': limit,
-            'isEtf': 'false',
-            'isActivelyTrading': 'true'
-        }
-        if sector != "All":
-            params['sector'] = sector
-            
         # CAMBIO CLAVE: Usamos "company-screener" en lugar de "stock-screener"
         # Nota: La base URL es api/v3, al concatenar queda api/v3/company-screener
         # Si falla, intentaremos forzar la url 'stable'
         
         # Intentamos primero con la estructura estándar
-        data = get_json("company-screener", params)
+        if len(sectors) > 1:
+            # Un request por sector, todos en paralelo, y juntamos los resultados
+            results = get_json_many([
+                ("company-screener", screener_params(min_market_cap, limit, s)) for s in sectors
+            ])
+            for s, r in zip(sectors, results):
+                if isinstance(r, Exception):
+                    st.warning(f"Sector {s}: {describe_error(r)}")
+            errors = [r for r in results if isinstance(r, dict)]
+            data = errors[0] if errors else [row for r in results if isinstance(r, list) for row in r]
+        else:
+            data = get_json("company-screener", screener_params(min_market_cap, limit, sectors[0] if sectors else None))
 
         # Verificación de datos
         if isinstance(data, list) and len(data) > 0:
-            df = pd.DataFrame(data)
-            
             # Definimos las columnas basados en el JSON que me mostraste
             cols_to_show = ['symbol', 'companyName', 'price', 'beta', 'marketCap', 'sector', 'industry', 'lastAnnualDividend', 'volume']
             
             # Filtramos solo las que existan para evitar errores
-            available_cols = [c for c in cols_to_show if c in df.columns]
+            lf = to_frame(data, cols_to_show)
+            
+            # Con varios sectores nos quedamos con los mayores market caps hasta el límite
+            if len(sectors) > 1 and 'marketCap' in lf.collect_schema().names():
+                lf = lf.sort('marketCap', descending=True, nulls_last=True).head(limit)
             
             # Formateo visual
-            st.dataframe(
-                df[available_cols].style.format({
-                    'price': '${:.2f}', 
-                    'beta': '{:.2f}', 
-                    'marketCap': '${:,.0f}',
-                    'volume': '{:,.0f}'
-                }),
-                use_container_width=True
-            )
+            show_table(lf.collect())
         
         elif isinstance(data, dict) and 'Error Message' in data:
             st.error(f"Error FMP: {data['Error Message']}")
@@ -91,6 +266,57 @@ def show_screener():
             st.warning("No se encontraron resultados con esos filtros.")
 
 # --- 2. SUPER CALENDAR (MACRO + EARNINGS + DIVIDENDS) ---
+def show_macro_calendar(data):
+    if isinstance(data, list) and len(data) > 0:
+        df = pl.from_dicts(data, infer_schema_length=None)
+        if 'date' in df.columns:
+            # Columnas estándar de FMP Economic Calendar
+            cols = ['date', 'country', 'event', 'actual', 'estimate', 'impact']
+            available = [c for c in cols if c in df.columns]
+            df = (
+                df.lazy()
+                .select(available)
+                .with_columns(pl.col('date').str.to_datetime())
+                .sort('date')
+                .collect()
+            )
+            show_table(df)
+        else:
+            st.write(df) # Fallback si cambian las columnas
+    elif isinstance(data, dict) and 'Error Message' in data:
+        st.error(f"Error: {data['Error Message']}")
+    else:
+        st.info("No hay eventos macroeconómicos para estas fechas.")
+
+def show_earnings_calendar(data):
+    if isinstance(data, list) and len(data) > 0:
+        # Según tu documentación: symbol, date, epsActual, epsEstimated, revenueActual...
+        cols_to_show = ['symbol', 'date', 'epsEstimated', 'epsActual', 'revenueEstimated', 'revenueActual']
+        lf = to_frame(data, cols_to_show)
+        
+        # Formateo visual
+        df = lf.collect()
+        if not df.is_empty():
+            show_table(df)
+    elif isinstance(data, dict) and 'Error Message' in data:
+        st.error(f"Error: {data['Error Message']}")
+    else:
+        st.info("No hay reportes de resultados programados.")
+
+def show_dividends_calendar(data):
+    if isinstance(data, list) and len(data) > 0:
+        # Según tu documentación: symbol, date, adjDividend, yield, paymentDate
+        cols_to_show = ['symbol', 'date', 'adjDividend', 'yield', 'paymentDate']
+        lf = to_frame(data, cols_to_show)
+        
+        df = lf.collect()
+        if not df.is_empty():
+            show_table(df)
+    elif isinstance(data, dict) and 'Error Message' in data:
+        st.error(f"Error: {data['Error Message']}")
+    else:
+        st.info("No hay dividendos programados.")
+
 def show_calendar():
     st.header("📅 Calendario de Mercado")
     
@@ -110,93 +336,58 @@ def show_calendar():
         'to': end_date.strftime("%Y-%m-%d")
     }
 
+    # Endpoints "stable" de cada pestaña
+    urls = {
+        'macro': f"{STABLE_URL}/economic-calendar",
+        'earnings': f"{STABLE_URL}/earnings-calendar",
+        'dividends': f"{STABLE_URL}/dividends-calendar",
+    }
+    results = {}
+
+    # Carga las tres pestañas en paralelo con un solo clic
+    if st.button("Cargar Todo"):
+        data = get_json_many([(url, params) for url in urls.values()])
+        results = dict(zip(urls, data))
+
     # --- PESTAÑA 1: MACROECONOMÍA ---
     with tab1:
         if st.button("Cargar Datos Macro"):
-            # Endpoint: https://financialmodelingprep.com/stable/economic-calendar
-            url = "https://financialmodelingprep.com/stable/economic-calendar"
-            data = get_json(url, params)
-            
-            if isinstance(data, list) and len(data) > 0:
-                df = pd.DataFrame(data)
-                if 'date' in df.columns:
-                    df['date'] = pd.to_datetime(df['date'])
-                    df = df.sort_values(by='date')
-                    # Columnas estándar de FMP Economic Calendar
-                    cols = ['date', 'country', 'event', 'actual', 'estimate', 'impact']
-                    available = [c for c in cols if c in df.columns]
-                    st.dataframe(df[available], use_container_width=True)
-                else:
-                    st.write(df) # Fallback si cambian las columnas
-            elif isinstance(data, dict) and 'Error Message' in data:
-                st.error(f"Error: {data['Error Message']}")
-            else:
-                st.info("No hay eventos macroeconómicos para estas fechas.")
+            results['macro'] = get_json(urls['macro'], params)
+        if 'macro' in results:
+            show_result(show_macro_calendar, results['macro'])
 
     # --- PESTAÑA 2: EARNINGS (RESULTADOS) ---
     with tab2:
         if st.button("Cargar Earnings"):
-            # Endpoint: https://financialmodelingprep.com/stable/earnings-calendar
-            url = "https://financialmodelingprep.com/stable/earnings-calendar"
-            data = get_json(url, params)
-            
-            if isinstance(data, list) and len(data) > 0:
-                df = pd.DataFrame(data)
-                # Según tu documentación: symbol, date, epsActual, epsEstimated, revenueActual...
-                cols_to_show = ['symbol', 'date', 'epsEstimated', 'epsActual', 'revenueEstimated', 'revenueActual']
-                available = [c for c in cols_to_show if c in df.columns]
-                
-                if not df.empty:
-                    # Formateo visual
-                    st.dataframe(
-                        df[available].style.format({
-                            'epsEstimated': '{:.2f}',
-                            'epsActual': '{:.2f}',
-                            'revenueEstimated': '${:,.0f}',
-                            'revenueActual': '${:,.0f}'
-                        }),
-                        use_container_width=True
-                    )
-            elif isinstance(data, dict) and 'Error Message' in data:
-                st.error(f"Error: {data['Error Message']}")
-            else:
-                st.info("No hay reportes de resultados programados.")
+            results['earnings'] = get_json(urls['earnings'], params)
+        if 'earnings' in results:
+            show_result(show_earnings_calendar, results['earnings'])
 
     # --- PESTAÑA 3: DIVIDENDOS ---
     with tab3:
         if st.button("Cargar Dividendos"):
-            # Endpoint: https://financialmodelingprep.com/stable/dividends-calendar
-            url = "https://financialmodelingprep.com/stable/dividends-calendar"
-            data = get_json(url, params)
-            
-            if isinstance(data, list) and len(data) > 0:
-                df = pd.DataFrame(data)
-                # Según tu documentación: symbol, date, adjDividend, yield, paymentDate
-                cols_to_show = ['symbol', 'date', 'adjDividend', 'yield', 'paymentDate']
-                available = [c for c in cols_to_show if c in df.columns]
-                
-                if not df.empty:
-                    st.dataframe(
-                        df[available].style.format({
-                            'adjDividend': '${:.3f}',
-                            'yield': '{:.2f}%'
-                        }),
-                        use_container_width=True
-                    )
-            elif isinstance(data, dict) and 'Error Message' in data:
-                st.error(f"Error: {data['Error Message']}")
-            else:
-                st.info("No hay dividendos programados.")
+            results['dividends'] = get_json(urls['dividends'], params)
+        if 'dividends' in results:
+            show_result(show_dividends_calendar, results['dividends'])
 # --- 3. INFORMACIÓN DE SÍMBOLOS ---
+def _trim_profile(profile):
+    return {k: profile[k] for k in PROFILE_FIELDS if k in profile}
+
+def get_profile(symbol):
+    # Perfil individual: la caché en memoria (5 min) y la de SQLite (24 h)
+    # ya evitan repetir la llamada al volver al mismo símbolo
+    data = get_json(f"profile/{symbol}")
+    if isinstance(data, list) and data:
+        return _trim_profile(data[0])
+    return None
+
 def show_symbol_info():
     st.header("ℹ️ Información de Símbolo")
     symbol = st.text_input("Ingresa el Ticker (ej. AAPL, TSLA)", "AAPL").upper()
     
     if symbol:
-        data = get_json(f"profile/{symbol}")
-        if data:
-            profile = data[0]
-            
+        profile = get_profile(symbol)
+        if profile:
             c1, c2 = st.columns([1, 3])
             with c1:
                 st.image(profile.get('image'), width=100)
@@ -212,20 +403,56 @@ def show_symbol_info():
                 st.write(f"[Web Oficial]({profile.get('website')})")
 
 # --- 4. TREND ANALYSIS (Técnico) ---
+def sma(values, window):
+    # Media móvil simple con sumas acumuladas: una sola pasada vectorizada
+    # (mismo resultado que rolling(window).mean(), NaN en los primeros días).
+    # Los cierres que faltan suman 0 y se cuentan aparte, así solo las
+    # ventanas que los contienen quedan en NaN
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values)
+    cs = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    out = np.full(values.shape, np.nan)
+    full = (counts[window:] - counts[:-window]) == window
+    out[window - 1:] = np.where(full, (cs[window:] - cs[:-window]) / window, np.nan)
+    return out
+
+@st.cache_data(ttl=3600)
+def _load_hist(symbol):
+    # Descarga + DataFrame + medias móviles en caché: los reruns del gráfico
+    # no vuelven a calcular nada mientras no cambie el símbolo
+    data = get_json(f"historical-price-full/{symbol}")
+    if not (data and 'historical' in data):
+        return None
+    
+    # Últimos 200 días y solo las columnas que usa el gráfico (el schema
+    # parcial descarta el resto al construir el DataFrame)
+    hist = (
+        pl.from_dicts(data['historical'][:200], schema=HIST_COLS, infer_schema_length=None)
+        .lazy()
+        .with_columns(pl.col('date').str.to_datetime())
+        .collect()
+    )
+    
+    # Agregar medias móviles simples (cálculo manual rápido)
+    close = hist['close'].to_numpy()
+    hist = hist.with_columns(
+        pl.Series('SMA_50', sma(close, 50)),
+        pl.Series('SMA_20', sma(close, 20))
+    )
+    # Plotly trabaja con pandas: convertimos solo al final
+    return hist.to_pandas(use_pyarrow_extension_array=True)
+
 def show_trend_analysis():
     st.header("📈 Trend Analysis & Charts")
     symbol = st.text_input("Ticker para análisis", "NVDA").upper()
     
     if symbol:
         # Obtener histórico diario
-        data = get_json(f"historical-price-full/{symbol}")
+        df = _load_hist(symbol)
         
-        if data and 'historical' in data:
-            hist_data = data['historical'][:200] # Últimos 200 días
-            df = pd.DataFrame(hist_data)
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # Crear gráfico de velas con Plotly
+        if df is not None:
+            # Crear gráfico de velas con Plotly (df ya viene de la caché)
             fig = go.Figure(data=[go.Candlestick(x=df['date'],
                             open=df['open'],
                             high=df['high'],
@@ -233,14 +460,11 @@ def show_trend_analysis():
                             close=df['close'],
                             name='Precio')])
             
-            # Agregar medias móviles simples (cálculo manual rápido)
-            df['SMA_50'] = df['close'].rolling(window=50).mean()
-            df['SMA_20'] = df['close'].rolling(window=20).mean()
-            
             fig.add_trace(go.Scatter(x=df['date'], y=df['SMA_50'], line=dict(color='orange', width=1), name='SMA 50'))
             fig.add_trace(go.Scatter(x=df['date'], y=df['SMA_20'], line=dict(color='blue', width=1), name='SMA 20'))
             
-            fig.update_layout(title=f"Análisis de Tendencia: {symbol}", xaxis_rangeslider_visible=False)
+            # uirevision conserva el zoom del usuario entre reruns del mismo símbolo
+            fig.update_layout(title=f"Análisis de Tendencia: {symbol}", xaxis_rangeslider_visible=False, uirevision=symbol)
             st.plotly_chart(fig, use_container_width=True)
             
             # Datos técnicos rápidos
@@ -262,38 +486,36 @@ def show_currency_meter():
     # --- CORRECCIÓN DE SEGURIDAD ---
     # 1. Verificamos si recibimos una lista válida de datos
     if isinstance(data, list) and len(data) > 0:
-        df = pd.DataFrame(data)
-        
         # Filtrar solo los majors
-        df = df[df['symbol'].isin(majors)]
+        df = (
+            to_frame(data, ['symbol', 'changesPercentage'])
+            .filter(pl.col('symbol').is_in(majors))
+            .collect()
+        )
         
-        if df.empty:
+        if df.is_empty():
             st.warning("No se encontraron datos recientes de Forex.")
             return
 
-        strength_scores = {}
-        
-        # Calcular fuerza relativa base USD
-        for index, row in df.iterrows():
-            sym = row['symbol']
-            change = row['changesPercentage']
-            
-            # Si data viene mal, change puede ser None, protegemos eso
-            if change is None:
-                change = 0.0
-            
-            if sym in ['EURUSD', 'GBPUSD', 'AUDUSD', 'NZDUSD']:
-                base = sym[:3] # EUR, GBP...
-                strength_scores[base] = change
-            elif sym in ['USDJPY', 'USDCHF', 'USDCAD']:
-                quote = sym[3:] # JPY, CHF...
-                strength_scores[quote] = -change # Inverso porque USD es base
-        
-        strength_scores['USD'] = 0.0
+        # Calcular fuerza relativa base USD en una sola expresión vectorizada:
+        # en los pares USDXXX la moneda es la cotizada y el signo se invierte
+        usd_base = pl.col('symbol').str.starts_with('USD')
+        df_strength = df.select(
+            pl.when(usd_base)
+            .then(pl.col('symbol').str.slice(3, 3)) # JPY, CHF...
+            .otherwise(pl.col('symbol').str.slice(0, 3)) # EUR, GBP...
+            .alias('Moneda'),
+            # Si data viene mal, el cambio puede ser nulo, protegemos eso
+            (pl.when(usd_base).then(-1.0).otherwise(1.0)
+             * pl.col('changesPercentage').fill_null(0.0).cast(pl.Float64))
+            .alias('Fuerza')
+        )
         
         # Crear DataFrame para visualizar
-        df_strength = pd.DataFrame(list(strength_scores.items()), columns=['Moneda', 'Fuerza'])
-        df_strength = df_strength.sort_values(by='Fuerza', ascending=False)
+        df_strength = pl.concat([
+            df_strength,
+            pl.DataFrame({'Moneda': ['USD'], 'Fuerza': [0.0]})
+        ]).sort('Fuerza', descending=True)
         
         # Visualización
         fig = go.Figure(go.Bar(
@@ -307,7 +529,7 @@ def show_currency_meter():
         ))
         fig.update_layout(title="Fuerza Relativa de Divisas (Intradía)")
         st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(df_strength, use_container_width=True)
+        show_table(df_strength)
 
     # 2. Si recibimos un diccionario, es un error de la API
     elif isinstance(data, dict) and 'Error Message' in data:
@@ -318,6 +540,15 @@ def show_currency_meter():
         st.error("No se pudieron cargar los datos de Forex.")
 # --- NAVEGACIÓN PRINCIPAL ---
 def main():
+    # Precarga en segundo plano, una vez por sesión
+    if "warmed" not in st.session_state:
+        st.session_state.warmed = True
+        # Con el contexto del script, como en get_json_many, para que
+        # _session() y _api_key() (st.cache_resource) funcionen sin avisos
+        thread = threading.Thread(target=_prewarm, daemon=True)
+        add_script_run_ctx(thread, get_script_run_ctx())
+        thread.start()
+
     st.sidebar.title("🛠️ Trading Tools")
     st.sidebar.write("Powered by FMP API")
     
@@ -325,18 +556,26 @@ def main():
                               ["Stock Screener", "Economic Calendar", "Info Símbolos", "Trend Analysis", "Currency Strength"])
     
     st.sidebar.markdown("---")
+    if st.sidebar.button("Limpiar caché"):
+        _session().cache.clear()
+        st.cache_data.clear()
+        _api_key.clear()
     st.sidebar.caption("Datos provistos por Financial Modeling Prep")
 
-    if option == "Stock Screener":
-        show_screener()
-    elif option == "Economic Calendar":
-        show_calendar()
-    elif option == "Info Símbolos":
-        show_symbol_info()
-    elif option == "Trend Analysis":
-        show_trend_analysis()
-    elif option == "Currency Strength":
-        show_currency_meter()
+    try:
+        if option == "Stock Screener":
+            show_screener()
+        elif option == "Economic Calendar":
+            show_calendar()
+        elif option == "Info Símbolos":
+            show_symbol_info()
+        elif option == "Trend Analysis":
+            show_trend_analysis()
+        elif option == "Currency Strength":
+            show_currency_meter()
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
+        # Timeouts, rate limits agotados, 5xx o respuestas que no son JSON
+        st.error(f"Error de conexión: {describe_error(e)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file